@@ -5,20 +5,149 @@ Uses computer vision to detect building outlines and calculate accurate areas fr
 This service validates and enhances AI-extracted data with precise geometric calculations.
 """
 
+import os
+import re
+import math
+import hashlib
 import sys
-import json
+import concurrent.futures
 import cv2
+import numba
 import numpy as np
-from pdf2image import convert_from_path
+import orjson
+import shapely
+from multiprocessing import Pool
+from pdf2image import convert_from_path, pdfinfo_from_path
 from pathlib import Path
 import tempfile
 import argparse
 
+# Drawing scale such as "1:100" or "1 : 62.5"
+_SCALE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*:\s*(\d+(?:\.\d+)?)\s*$')
+
+# Longest edge (in pixels) of the mask used for rectilinear decomposition
+DECOMPOSITION_MAX_EDGE = 400
+
+# Outlines with more points than this are simplified with approxPolyDP
+CONTOUR_SIMPLIFY_MIN_POINTS = 200
+
+# Number of widest connected components compared by enclosed area
+OUTLINE_CANDIDATES = 5
+
+# Rendered pages beyond this total size are pruned, least recently used first
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Rectangle hints below this confidence always go through the full pipeline
+HINT_MIN_CONFIDENCE = 0.7
+
+# Margin added around the hinted bounding box, as a fraction of its size
+HINT_MARGIN = 0.05
+
+# Fraction of each rectangle side that must be inked to accept a hint
+HINT_EDGE_COVERAGE = 0.9
+
+
+@numba.njit(cache=True)
+def _largest_rectangle(mask: np.ndarray) -> tuple:
+    """Find the largest all-ones rectangle in a binary mask (histogram/skyline method)."""
+    rows, cols = mask.shape
+    heights = np.zeros(cols + 1, dtype=np.int64)
+    stack = np.empty(cols + 1, dtype=np.int64)
+    best = (0, 0, 0, 0, 0)
+
+    for row in range(rows):
+        for col in range(cols):
+            heights[col] = heights[col] + 1 if mask[row, col] else 0
+
+        # Sweep the skyline; the sentinel column of height 0 flushes the stack
+        top = 0
+        for col in range(cols + 1):
+            while top > 0 and heights[stack[top - 1]] >= heights[col]:
+                height = heights[stack[top - 1]]
+                top -= 1
+                left = stack[top - 1] + 1 if top > 0 else 0
+                width = col - left
+                if height * width > best[4]:
+                    best = (left, row - height + 1, width, height, height * width)
+            stack[top] = col
+            top += 1
+
+    return best
+
+
+@numba.njit(cache=True)
+def decompose_rectilinear(mask: np.ndarray, min_area: int, max_sections: int) -> list:
+    """
+    Greedily carve a binary mask into maximal rectangles.
+
+    Args:
+        mask: 2D uint8 array, non-zero inside the shape
+        min_area: Stop once the largest remaining rectangle is smaller than this
+        max_sections: Maximum number of rectangles to extract
+
+    Returns:
+        List of (x, y, width, height) tuples, largest first
+    """
+    remaining = mask.copy()
+    rects = []
+    for _ in range(max_sections):
+        x, y, w, h, area = _largest_rectangle(remaining)
+        if area == 0 or area < min_area:
+            break
+        rects.append((x, y, w, h))
+        remaining[y:y + h, x:x + w] = 0
+    return rects
+
+
+# Compile the decomposition routine up front so the first PDF does not pay for it
+decompose_rectilinear(np.ones((2, 2), dtype=np.uint8), 1, 1)
+
+
+def _check_cpu_baseline():
+    """
+    Warn when the installed OpenCV build contains no AVX2 code paths.
+
+    This only inspects how OpenCV was compiled: every official x86 wheel lists
+    AVX2 under its dispatched code, so the check says nothing about whether the
+    host CPU supports it. It catches custom or non-x86 builds without it.
+    """
+    if 'AVX2' not in cv2.getBuildInformation():
+        print("Warning: OpenCV build has no AVX2 code paths, edge detection will be slower",
+              file=sys.stderr)
+
+
+# Checked once per process rather than for every calculator
+_check_cpu_baseline()
+
+
+def cache_dir() -> Path:
+    """
+    Directory for rendered pages, keyed by PDF content and render settings.
+
+    Uses $XDG_CACHE_HOME when it is an absolute path, otherwise ~/.cache; None
+    when neither can be resolved, which disables the cache.
+    """
+    xdg = os.environ.get('XDG_CACHE_HOME', '')
+    if xdg and os.path.isabs(xdg):
+        return Path(xdg) / 'material-takeoff'
+    try:
+        return Path.home() / '.cache' / 'material-takeoff'
+    except RuntimeError:
+        return None
+
+
+def _is_number(value) -> bool:
+    """True for finite int/float values (bool excluded), as found in JSON hints."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
 
 class AreaCalculator:
     """Calculate building areas from PDF floor plans using computer vision."""
 
-    def __init__(self, pdf_path: str, scale: str = "1:100", debug: bool = False):
+    def __init__(self, pdf_path: str, scale: str = "1:100", debug: bool = False,
+                 render_dpi: int = 150, max_edge: int = 2000, page: int = 1,
+                 num_threads: int = None, hint: dict = None, use_cache: bool = True,
+                 buffers: dict = None):
         """
         Initialize the area calculator.
 
@@ -26,38 +155,167 @@ class AreaCalculator:
             pdf_path: Path to the PDF file
             scale: Drawing scale (e.g., "1:100", "1:50")
             debug: Enable debug output with annotated images
+            render_dpi: Resolution used to rasterize the PDF
+            max_edge: Maximum length in pixels of the longest image edge
+            page: Page of the PDF to analyze (1-based)
+            num_threads: CPU threads for OpenCV and Poppler (defaults to all cores)
+            hint: Optional prior result, e.g. {'shape_type': 'rectangle',
+                'bbox_hint': [x1, y1, x2, y2], 'confidence': 0.9}, with the box
+                given as fractions of the page width and height
+            use_cache: Reuse rendered pages from cache_dir() across runs
+            buffers: Intermediate image buffers to share with other calculators
+                that run one after another (e.g. in --daemon mode)
         """
         self.pdf_path = pdf_path
+        self.page = page
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.hint = hint
+        self.use_cache = use_cache
         self.scale = self._parse_scale(scale)
         self.debug = debug
+        self.render_dpi = render_dpi
+        self.max_edge = max_edge
+        # Actual resolution of the rasterized image, updated after downscaling
+        self._set_effective_dpi(render_dpi)
+
+        # Structuring element for closing gaps in the edge map
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+        # Intermediate image buffers, allocated on first use and reused afterwards
+        self._buffers = buffers if buffers is not None else {}
+
+        # Let OpenCV use its SIMD kernels and parallel row loops
+        cv2.setUseOptimized(True)
+        cv2.setNumThreads(self.num_threads)
+
+        # Start rasterizing in the background; pdftoppm runs as a subprocess, so
+        # the remaining setup overlaps with it until calculate_area needs the image
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._img_future = executor.submit(self.convert_pdf_to_image)
+        executor.shutdown(wait=False)
 
     def _parse_scale(self, scale_str: str) -> float:
         """Parse scale string like '1:100' to a multiplier."""
-        try:
-            if ':' in scale_str:
-                parts = scale_str.split(':')
-                return float(parts[1]) / float(parts[0])
+        match = _SCALE_RE.match(scale_str)
+        if match is None or float(match.group(1)) == 0 or float(match.group(2)) == 0:
             return 100.0  # Default to 1:100
-        except:
-            return 100.0
+        return float(match.group(2)) / float(match.group(1))
+
+    def convert_pdf_to_image(self, page_num: int = None) -> np.ndarray:
+        """Convert one page of the PDF to a grayscale image, capped at max_edge pixels."""
+        if page_num is None:
+            page_num = self.page
 
-    def convert_pdf_to_image(self) -> np.ndarray:
-        """Convert first page of PDF to OpenCV image."""
         try:
-            # Convert PDF to images (first page only)
-            images = convert_from_path(self.pdf_path, first_page=1, last_page=1, dpi=300)
+            cache_path = self._cache_path(page_num) if self.use_cache else None
+            if cache_path is not None:
+                img = self._load_cached_image(cache_path)
+                if img is not None:
+                    return img
+
+            # Convert PDF to grayscale images (requested page only)
+            images = convert_from_path(self.pdf_path, first_page=page_num, last_page=page_num,
+                                       dpi=self.render_dpi, grayscale=True,
+                                       thread_count=self.num_threads)
 
             if not images:
                 raise ValueError("Failed to convert PDF to image")
 
-            # Convert PIL Image to OpenCV format
-            img = np.array(images[0])
-            img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+            # Single-channel uint8 image, no color conversion needed
+            img = np.asarray(images[0])
+
+            # Downscale oversized pages and track the resulting resolution
+            h, w = img.shape[:2]
+            scale = min(1.0, self.max_edge / max(h, w))
+            if scale < 1.0:
+                img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            self._set_effective_dpi(self.render_dpi * scale)
+
+            if cache_path is not None:
+                self._store_cached_image(cache_path, img)
 
             return img
         except Exception as e:
             raise Exception(f"PDF conversion failed: {str(e)}")
 
+    def _cache_path(self, page_num: int) -> Path:
+        """Cache file for a page, keyed by a BLAKE2 hash of the PDF and the render settings."""
+        directory = cache_dir()
+        if directory is None:
+            return None
+        digest = hashlib.blake2b(digest_size=16)
+        with open(self.pdf_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return directory / f"{digest.hexdigest()}_p{page_num}_{self.render_dpi}dpi_{self.max_edge}px.npz"
+
+    def _load_cached_image(self, cache_path: Path) -> np.ndarray:
+        """Load a cached page and its resolution; None if missing or unreadable."""
+        if not cache_path.exists():
+            return None
+        try:
+            with np.load(cache_path) as cached:
+                img = cached['image']
+                self._set_effective_dpi(float(cached['dpi']))
+            # Mark the page as recently used so pruning keeps it
+            os.utime(cache_path)
+            return img
+        except Exception:
+            return None
+
+    def _store_cached_image(self, cache_path: Path, img: np.ndarray):
+        """Write a rendered page to the cache; failures only cost the next run a re-render."""
+        tmp_path = None
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so concurrent runs never read a partial file
+            # (not named *.npz, so pruning never removes a file still being written)
+            with tempfile.NamedTemporaryFile(dir=cache_path.parent, suffix='.tmp',
+                                             delete=False) as tmp:
+                tmp_path = tmp.name
+                np.savez_compressed(tmp, image=img, dpi=self.effective_dpi)
+            os.replace(tmp_path, cache_path)
+            self._prune_cache(cache_path.parent)
+        except Exception as e:
+            # Do not leave a partial temporary file behind (e.g. when the disk is full)
+            if tmp_path is not None and os.path.exists(tmp_path):
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            print(f"Warning: could not cache rendered page: {e}", file=sys.stderr)
+
+    @staticmethod
+    def _prune_cache(directory: Path, max_bytes: int = None):
+        """Delete the least recently used pages until the cache fits in max_bytes."""
+        if max_bytes is None:
+            max_bytes = CACHE_MAX_BYTES
+        entries = []
+        for path in directory.glob('*.npz'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # Removed by a concurrent run
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            total -= size
+
+    def _buffer(self, name: str, shape: tuple, dtype=np.uint8) -> np.ndarray:
+        """Return a reusable intermediate buffer, reallocating only if the shape changes."""
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+        return buf
+
     def detect_building_outline(self, img: np.ndarray) -> list:
         """
         Detect the building outline using edge detection and contour analysis.
@@ -65,34 +323,150 @@ class AreaCalculator:
         Returns:
             List of contour points representing the building outline
         """
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        # Blur and halve the resolution in a single pass (5x5 Gaussian + decimation)
+        h, w = img.shape[:2]
+        small_shape = ((h + 1) // 2, (w + 1) // 2)
+        small = cv2.pyrDown(img, dst=self._buffer('small', small_shape))
+
+        # Edge detection on the half-resolution image: Scharr gradient
+        # magnitude |gx| + |gy| followed by a fixed threshold
+        gx = cv2.Scharr(small, cv2.CV_16S, 1, 0, dst=self._buffer('gx', small_shape, np.int16))
+        gy = cv2.Scharr(small, cv2.CV_16S, 0, 1, dst=self._buffer('gy', small_shape, np.int16))
+        abs_gx = cv2.convertScaleAbs(gx, dst=self._buffer('abs_gx', small_shape))
+        abs_gy = cv2.convertScaleAbs(gy, dst=self._buffer('abs_gy', small_shape))
+        magnitude = cv2.add(abs_gx, abs_gy, dst=self._buffer('magnitude', small_shape))
+        _, edges = cv2.threshold(magnitude, 40, 255, cv2.THRESH_BINARY,
+                                 dst=self._buffer('edges', small_shape))
+
+        # Halve the edge map again with 2x2 box averaging; any edge pixel in a
+        # block keeps the block set, so thin strokes stay connected
+        edge_shape = ((small_shape[0] + 1) // 2, (small_shape[1] + 1) // 2)
+        pooled = cv2.resize(edges, edge_shape[::-1], dst=self._buffer('pooled', edge_shape),
+                            interpolation=cv2.INTER_AREA)
+        cv2.threshold(pooled, 0, 255, cv2.THRESH_BINARY, dst=pooled)
 
-        # Apply Gaussian blur to reduce noise
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+        # Dilate edges to connect broken lines
+        dilated = cv2.dilate(pooled, self._kernel, dst=self._buffer('dilated', edge_shape),
+                             iterations=1)
 
-        # Edge detection
-        edges = cv2.Canny(blurred, 50, 150)
+        # Label connected edge regions; label 0 is background
+        num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(
+            dilated, labels=self._buffer('labels', edge_shape, np.int32), connectivity=8)
 
-        # Dilate edges to connect broken lines
-        kernel = np.ones((3, 3), np.uint8)
-        dilated = cv2.dilate(edges, kernel, iterations=2)
+        if num_labels < 2:
+            return None
+
+        # A long diagonal line can span a bigger bounding box than the building,
+        # so shortlist the widest components and keep the one enclosing the most
+        # area. Each is traced already reduced to dominant points (Teh-Chin)
+        extents = stats[1:, cv2.CC_STAT_WIDTH] * stats[1:, cv2.CC_STAT_HEIGHT]
+        candidates = 1 + np.argsort(extents)[::-1][:OUTLINE_CANDIDATES]
+        mask = self._buffer('mask', edge_shape)
+
+        approx = None
+        best_area = -1.0
+        for label in candidates:
+            cv2.compare(labels, int(label), cv2.CMP_EQ, dst=mask)
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL,
+                                           cv2.CHAIN_APPROX_TC89_KCOS)
+            if not contours:
+                continue
+            contour = max(contours, key=cv2.contourArea)
+            area = cv2.contourArea(contour)
+            if area > best_area:
+                approx, best_area = contour, area
+
+        if approx is None:
+            return None
 
-        # Find contours
-        contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # The traced boundary sits outside the drawn line by the dilation plus the
+        # blur/gradient spread (about one cell each); erode the filled outline by
+        # two cells so areas are not inflated
+        outline = self._buffer('outline', edge_shape)
+        outline.fill(0)
+        cv2.drawContours(outline, [approx], -1, 255, thickness=cv2.FILLED)
+        cv2.erode(outline, self._kernel, dst=outline, iterations=2)
+        contours, _ = cv2.findContours(outline, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_TC89_KCOS)
 
         if not contours:
             return None
 
-        # Find the largest contour (likely the building outline)
-        largest_contour = max(contours, key=cv2.contourArea)
+        approx = max(contours, key=cv2.contourArea)
+
+        # Only simplify further when the outline is still noisy (epsilon is
+        # relative to the perimeter, so the tolerance does not depend on resolution)
+        if len(approx) > CONTOUR_SIMPLIFY_MIN_POINTS:
+            epsilon = 0.01 * cv2.arcLength(approx, True)
+            approx = cv2.approxPolyDP(approx, epsilon, True)
 
-        # Approximate the contour to reduce points
-        epsilon = 0.01 * cv2.arcLength(largest_contour, True)
-        approx = cv2.approxPolyDP(largest_contour, epsilon, True)
+        # Map the points back to full-resolution coordinates (cell centers)
+        approx = approx * 4 + 2
 
         return approx
 
+    def validate_rectangle_hint(self, img: np.ndarray) -> np.ndarray:
+        """
+        Check a rectangle hint by looking only at its region of interest.
+
+        Returns:
+            The rectangle as a 4-point contour, or None when there is no usable
+            hint or the drawing does not show a rectangle there
+        """
+        hint = self.hint
+        if not isinstance(hint, dict) or hint.get('shape_type') != 'rectangle':
+            return None
+
+        # Malformed hints are ignored rather than failing the calculation
+        bbox = hint.get('bbox_hint')
+        if not isinstance(bbox, (list, tuple)) or len(bbox) != 4 or not all(map(_is_number, bbox)):
+            return None
+        confidence = hint.get('confidence', 1.0)
+        if not _is_number(confidence) or confidence < HINT_MIN_CONFIDENCE:
+            return None
+
+        # Region of interest in image pixels, with a small margin around the hint
+        h, w = img.shape[:2]
+        x1, y1, x2, y2 = bbox
+        margin_x = (x2 - x1) * HINT_MARGIN
+        margin_y = (y2 - y1) * HINT_MARGIN
+        left, right = int(max(0.0, x1 - margin_x) * w), int(min(1.0, x2 + margin_x) * w)
+        top, bottom = int(max(0.0, y1 - margin_y) * h), int(min(1.0, y2 + margin_y) * h)
+        if right - left < 2 or bottom - top < 2:
+            return None
+
+        # Dark lines on a light page become the foreground
+        roi = img[top:bottom, left:right]
+        _, ink = cv2.threshold(roi, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+        x, y, bw, bh = cv2.boundingRect(ink)
+        if bw < 2 or bh < 2:
+            return None
+
+        # The box must be the outline itself: a single outermost contour that spans
+        # all the ink and encloses a full rectangle. A dimension line or label next
+        # to the wall makes the ink box larger than the outline and rejects the hint
+        contours, _ = cv2.findContours(ink, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        outline = max(contours, key=cv2.contourArea)
+        if cv2.boundingRect(outline) != (x, y, bw, bh):
+            return None
+        if cv2.contourArea(outline) < 0.95 * (bw - 1) * (bh - 1):
+            return None
+
+        # All four sides of the bounding box must be drawn, otherwise it is not a rectangle
+        band = 3
+        coverage = (
+            ink[y:y + band, x:x + bw].any(axis=0).mean(),
+            ink[y + bh - band:y + bh, x:x + bw].any(axis=0).mean(),
+            ink[y:y + bh, x:x + band].any(axis=1).mean(),
+            ink[y:y + bh, x + bw - band:x + bw].any(axis=1).mean(),
+        )
+        if min(coverage) < HINT_EDGE_COVERAGE:
+            return None
+
+        x += left
+        y += top
+        return np.array([[[x, y]], [[x + bw - 1, y]], [[x + bw - 1, y + bh - 1]], [[x, y + bh - 1]]],
+                        dtype=np.int32)
+
     def decompose_complex_shape(self, contour: np.ndarray) -> dict:
         """
         Decompose a complex shape into rectangles.
@@ -113,7 +487,7 @@ class AreaCalculator:
             'is_simple_rectangle': False,
             'sections': [],
             'total_area_pixels': total_area,
-            'bounding_box': {'x': int(x), 'y': int(y), 'width': int(w), 'height': int(h)}
+            'bounding_box': {'x': x, 'y': y, 'width': w, 'height': h}
         }
 
         # Check if it's a simple rectangle (fill ratio > 0.95)
@@ -122,43 +496,168 @@ class AreaCalculator:
             result['is_simple_rectangle'] = True
             result['sections'] = [{
                 'name': 'main',
-                'width_pixels': int(w),
-                'height_pixels': int(h),
-                'area_pixels': int(w * h)
+                'width_pixels': w,
+                'height_pixels': h,
+                'area_pixels': w * h
             }]
             return result
 
-        # For complex shapes, try to detect L, T, or U patterns
-        # This is a simplified heuristic - could be expanded
-        if 0.5 < fill_ratio <= 0.75:
-            result['shape_type'] = 'L-shape (detected)'
-            # For now, use the contour area directly
-            # In production, you'd implement more sophisticated decomposition
+        # A rotated rectangle fills its minimum-area (rotated) bounding box instead
+        (rect_w, rect_h), angle = self._oriented_box(contour)
+        rotated_area = rect_w * rect_h
+        rotated_fill_ratio = total_area / rotated_area if rotated_area > 0 else 0
+
+        if rotated_fill_ratio > 0.95:
+            result['shape_type'] = 'rectangle (rotated)'
+            result['is_simple_rectangle'] = True
+            result['rotation_degrees'] = round(angle, 1)
             result['sections'] = [{
-                'name': 'complex',
-                'area_pixels': int(total_area),
-                'note': 'Complex shape detected - manual decomposition recommended'
+                'name': 'main',
+                'width_pixels': int(round(rect_w)),
+                'height_pixels': int(round(rect_h)),
+                'area_pixels': int(round(total_area)),
+                'rotation_degrees': round(angle, 1)
             }]
+            return result
+
+        # For complex shapes, rasterize the outline at reduced resolution and
+        # carve it into rectangles to detect L, T, or U patterns
+        factor = min(1.0, DECOMPOSITION_MAX_EDGE / max(w, h, 1))
+        mask = np.zeros((int(h * factor) + 1, int(w * factor) + 1), dtype=np.uint8)
+        points = np.round((contour.reshape(-1, 2) - (x, y)) * factor).astype(np.int32)
+        cv2.drawContours(mask, [points], -1, 1, thickness=cv2.FILLED)
+
+        min_area = max(1, int(0.02 * mask.sum()))
+        rects = decompose_rectilinear(mask, min_area, 8)
+
+        # Scale rectangles back to image pixels
+        rects = [(x + rx / factor, y + ry / factor, rw / factor, rh / factor)
+                 for rx, ry, rw, rh in rects]
+
+        # Exact area of the outline inside each rectangle, computed for all
+        # rectangles in one vectorized GEOS call (a line or point has no area)
+        boxes = np.array(rects, dtype=np.float64).reshape(-1, 4)
+        if len(contour) < 3 or total_area == 0:
+            section_areas = np.zeros(len(boxes))
         else:
-            result['shape_type'] = 'complex'
-            result['sections'] = [{
-                'name': 'complex',
-                'area_pixels': int(total_area)
-            }]
+            polygon = shapely.Polygon(contour.reshape(-1, 2))
+            if not polygon.is_valid:
+                polygon = shapely.make_valid(polygon)
+            cells = shapely.box(boxes[:, 0], boxes[:, 1],
+                                boxes[:, 0] + boxes[:, 2], boxes[:, 1] + boxes[:, 3])
+            section_areas = shapely.area(shapely.intersection(polygon, cells))
+
+        for i, ((rx, ry, rw, rh), area) in enumerate(zip(rects, section_areas)):
+            result['sections'].append({
+                'name': 'main' if i == 0 else f'wing_{i}',
+                'x_pixels': int(rx),
+                'y_pixels': int(ry),
+                'width_pixels': int(rw),
+                'height_pixels': int(rh),
+                'area_pixels': int(round(area))
+            })
+
+        # Keep whatever the rectangles do not cover (sloped edges, small notches)
+        remainder = total_area - sum(s['area_pixels'] for s in result['sections'])
+        if remainder > 0.02 * total_area:
+            result['sections'].append({
+                'name': 'remainder',
+                'area_pixels': int(remainder),
+                'note': 'Non-rectangular area not covered by the sections above'
+            })
+
+        result['shape_type'] = self._classify_sections(rects) if remainder <= 0.02 * total_area else 'complex'
 
         return result
 
-    def pixels_to_meters(self, pixels: float, dpi: float = 300) -> float:
+    @staticmethod
+    def _oriented_box(contour: np.ndarray) -> tuple:
+        """
+        Minimum-area rectangle of the contour, oriented along its long side.
+
+        Returns:
+            ((length, width), angle) with length >= width and the angle of the
+            long side in degrees, in the range (-90, 90]
+        """
+        _, (rect_w, rect_h), angle = cv2.minAreaRect(contour)
+        if rect_w < rect_h:
+            rect_w, rect_h = rect_h, rect_w
+            angle -= 90
+        if angle <= -90:
+            angle += 180
+        return (rect_w, rect_h), angle
+
+    @staticmethod
+    def _classify_sections(rects: list) -> str:
+        """Name a rectilinear shape from its rectangles (largest first)."""
+        if len(rects) == 1:
+            return 'rectangle'
+        if len(rects) not in (2, 3):
+            return 'complex'
+
+        bx, by, bw, bh = rects[0]
+        tol = 0.05 * max(bw, bh)
+        wings = []
+        for rx, ry, rw, rh in rects[1:]:
+            # Side of the main section the wing is attached to, the wing's span
+            # along that side and the span of the side itself
+            if ry + rh <= by + tol or ry >= by + bh - tol:
+                side = 'top' if ry + rh <= by + tol else 'bottom'
+                span, main_span = (rx, rx + rw), (bx, bx + bw)
+            elif rx + rw <= bx + tol or rx >= bx + bw - tol:
+                side = 'left' if rx + rw <= bx + tol else 'right'
+                span, main_span = (ry, ry + rh), (by, by + bh)
+            else:
+                return 'complex'
+            at_start = abs(span[0] - main_span[0]) <= tol
+            at_end = abs(span[1] - main_span[1]) <= tol
+            wings.append((side, span, at_start, at_end))
+
+        if len(rects) == 2:
+            _, span, at_start, at_end = wings[0]
+            if at_start or at_end:
+                return 'L-shape'
+            # T: the wing sits within the side or spans past both ends of it; a
+            # wing overhanging only one end makes a step (Z) instead
+            main_span = (by, by + bh) if wings[0][0] in ('left', 'right') else (bx, bx + bw)
+            inside = span[0] >= main_span[0] - tol and span[1] <= main_span[1] + tol
+            covers = span[0] <= main_span[0] + tol and span[1] >= main_span[1] - tol
+            return 'T-shape' if inside or covers else 'complex'
+
+        (side_a, span_a, start_a, end_a), (side_b, span_b, start_b, end_b) = wings
+
+        # U: both arms on the same side, one at each end of it
+        if side_a == side_b:
+            return 'U-shape' if (start_a and end_b) or (start_b and end_a) else 'complex'
+
+        # T: wings on opposite sides that line up with each other at one end of
+        # the main section (a centred pair is a cross, a staggered pair a zig-zag)
+        opposite = {'top': 'bottom', 'bottom': 'top', 'left': 'right', 'right': 'left'}
+        lined_up = abs(span_a[0] - span_b[0]) <= tol and abs(span_a[1] - span_b[1]) <= tol
+        if opposite[side_a] == side_b and lined_up and (start_a or end_a):
+            return 'T-shape'
+        return 'complex'
+
+    def _set_effective_dpi(self, dpi: float):
+        """Record the image resolution and precompute the pixel-to-meter conversions."""
+        self.effective_dpi = float(dpi)
+        self._px_to_m = self.pixels_to_meters(1.0, self.effective_dpi)
+        self._pixels_per_m2 = (1.0 / self._px_to_m) ** 2
+
+    def pixels_to_meters(self, pixels, dpi: float = None):
         """
         Convert pixels to real-world meters based on scale and DPI.
 
         Args:
-            pixels: Measurement in pixels
-            dpi: Dots per inch (resolution of the image)
+            pixels: Measurement in pixels (scalar or NumPy array)
+            dpi: Dots per inch (defaults to the effective resolution of the image)
 
         Returns:
             Measurement in meters
         """
+        if dpi is None:
+            return pixels * self._px_to_m
+
         # Convert pixels to inches
         inches = pixels / dpi
 
@@ -181,13 +680,20 @@ class AreaCalculator:
             Dictionary with calculation results
         """
         try:
-            # Convert PDF to image
-            img = self.convert_pdf_to_image()
+            # Wait for the PDF rendered in the background
+            img = self._img_future.result()
 
-            # Detect building outline
-            contour = self.detect_building_outline(img)
+            # A confirmed rectangle hint skips edge detection entirely
+            contour = self.validate_rectangle_hint(img)
+            method = 'hint_validated'
 
+            # Detect building outline
             if contour is None:
+                contour = self.detect_building_outline(img)
+                method = 'computer_vision'
+
+            # A line or single point encloses no area and cannot be decomposed
+            if contour is None or len(contour) < 3 or cv2.contourArea(contour) == 0:
                 return {
                     'success': False,
                     'error': 'Could not detect building outline',
@@ -197,16 +703,24 @@ class AreaCalculator:
             # Decompose shape
             shape_info = self.decompose_complex_shape(contour)
 
-            # Convert pixel measurements to meters
-            for section in shape_info['sections']:
-                if 'width_pixels' in section:
-                    section['width_m'] = round(self.pixels_to_meters(section['width_pixels']), 2)
-                    section['height_m'] = round(self.pixels_to_meters(section['height_pixels']), 2)
-                    section['area_m2'] = round(section['width_m'] * section['height_m'], 2)
-                if 'area_pixels' in section:
-                    # For irregular shapes, convert total pixel area
-                    pixels_per_m2 = (300 / 25.4 / self.scale) ** 2  # pixels per meter squared
-                    section['area_m2'] = round(section['area_pixels'] / pixels_per_m2, 2)
+            # Convert pixel measurements to meters, all sized sections at once
+            sized = [s for s in shape_info['sections'] if 'width_pixels' in s]
+            if sized:
+                dims_px = np.array([(s['width_pixels'], s['height_pixels']) for s in sized],
+                                   dtype=np.float64)
+                dims_m = np.round(self.pixels_to_meters(dims_px), 2)
+                for section, (width_m, height_m) in zip(sized, dims_m.tolist()):
+                    section['width_m'] = width_m
+                    section['height_m'] = height_m
+                    section['area_m2'] = round(width_m * height_m, 2)
+
+            # Convert pixel areas (exact for irregular shapes) in one operation
+            with_area = [s for s in shape_info['sections'] if 'area_pixels' in s]
+            areas_px = np.fromiter((s['area_pixels'] for s in with_area), dtype=np.float64,
+                                   count=len(with_area))
+            areas_m2 = np.round(areas_px / self._pixels_per_m2, 2)
+            for section, area_m2 in zip(with_area, areas_m2.tolist()):
+                section['area_m2'] = area_m2
 
             # Calculate total area
             total_area_m2 = sum(s.get('area_m2', 0) for s in shape_info['sections'])
@@ -217,17 +731,21 @@ class AreaCalculator:
                 'is_simple_rectangle': shape_info['is_simple_rectangle'],
                 'sections': shape_info['sections'],
                 'total_area_m2': round(total_area_m2, 2),
-                'scale_used': f"1:{int(self.scale)}",
-                'method': 'computer_vision',
+                'scale_used': f"1:{self.scale:g}",
+                'method': method,
                 'confidence': 0.85 if shape_info['is_simple_rectangle'] else 0.65
             }
 
+            if 'rotation_degrees' in shape_info:
+                result['rotation_degrees'] = shape_info['rotation_degrees']
+
             # Save debug image if requested
             if self.debug:
-                debug_img = img.copy()
+                debug_img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
                 cv2.drawContours(debug_img, [contour], -1, (0, 255, 0), 3)
-                cv2.imwrite('debug_outline.png', debug_img)
-                result['debug_image'] = 'debug_outline.png'
+                debug_path = 'debug_outline.png' if self.page == 1 else f'debug_outline_p{self.page}.png'
+                cv2.imwrite(debug_path, debug_img)
+                result['debug_image'] = debug_path
 
             return result
 
@@ -239,20 +757,124 @@ class AreaCalculator:
             }
 
 
+def _process_page(job: tuple) -> dict:
+    """Analyze a single page in a worker process."""
+    pdf_path, page, scale, debug, use_cache = job
+    # One OpenCV thread per worker; the pool already uses every core
+    calculator = AreaCalculator(pdf_path, scale, debug, page=page, num_threads=1,
+                                use_cache=use_cache)
+    result = calculator.calculate_area()
+    result['page'] = page
+    return result
+
+
+def calculate_all_pages(pdf_path: str, scale: str = "1:100", debug: bool = False,
+                        use_cache: bool = True) -> dict:
+    """
+    Analyze every page of the PDF in parallel, one worker process per page.
+
+    Returns:
+        Dictionary with the per-page results and the total over all pages
+        where an outline was found
+    """
+    try:
+        page_count = int(pdfinfo_from_path(pdf_path)['Pages'])
+        if page_count < 1:
+            raise ValueError("PDF has no pages")
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f"PDF inspection failed: {str(e)}",
+            'message': 'Area calculation failed'
+        }
+
+    jobs = [(pdf_path, page, scale, debug, use_cache) for page in range(1, page_count + 1)]
+    with Pool(min(page_count, os.cpu_count() or 1)) as pool:
+        pages = pool.map(_process_page, jobs)
+
+    measured = [p for p in pages if p['success']]
+    return {
+        'success': bool(measured),
+        'page_count': page_count,
+        'pages': pages,
+        'total_area_m2': round(sum(p['total_area_m2'] for p in measured), 2),
+        'scale_used': measured[0]['scale_used'] if measured else None,
+        'method': 'computer_vision'
+    }
+
+
+def _warm_up(buffers: dict = None):
+    """Run the CV stages once on a synthetic L-shaped outline to prime OpenCV and Numba."""
+    img = np.full((256, 256), 255, dtype=np.uint8)
+    outline = np.array([[32, 32], [224, 32], [224, 128], [128, 128], [128, 224], [32, 224]],
+                       dtype=np.int32)
+    cv2.polylines(img, [outline], True, 0, 3)
+
+    # /dev/null never renders; its background conversion fails and is not awaited
+    calculator = AreaCalculator(os.devnull, use_cache=False, buffers=buffers)
+    contour = calculator.detect_building_outline(img)
+    if contour is not None:
+        calculator.decompose_complex_shape(contour)
+
+
+def run_daemon(scale: str, debug: bool, use_cache: bool = True) -> int:
+    """
+    Process PDF paths read from stdin, one per line, until stdin closes.
+
+    Each result is written as a single line of JSON so a long-running
+    worker can serve many documents without paying the start-up cost again.
+    """
+    # One set of image buffers for every document, instead of one per calculator
+    buffers = {}
+    _warm_up(buffers)
+
+    for line in sys.stdin:
+        pdf_path = line.strip()
+        if not pdf_path:
+            continue
+
+        calculator = AreaCalculator(pdf_path, scale, debug, use_cache=use_cache, buffers=buffers)
+        result = calculator.calculate_area()
+        sys.stdout.buffer.write(orjson.dumps(
+            result, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE))
+        sys.stdout.flush()
+
+    return 0
+
+
 def main():
     """CLI interface for the area calculator."""
     parser = argparse.ArgumentParser(description='Calculate building area from PDF floor plans')
-    parser.add_argument('pdf_path', help='Path to the PDF file')
+    parser.add_argument('pdf_path', nargs='?', help='Path to the PDF file')
     parser.add_argument('--scale', default='1:100', help='Drawing scale (e.g., 1:100)')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('--hint', type=orjson.loads,
+                        help='JSON shape hint, e.g. \'{"shape_type": "rectangle", "bbox_hint": [0.1, 0.1, 0.9, 0.8]}\'')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always re-render the PDF instead of using the page cache')
+    parser.add_argument('--all-pages', action='store_true',
+                        help='Analyze every page in parallel and report the combined area')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Read PDF paths from stdin and write one JSON result per line')
 
     args = parser.parse_args()
 
-    calculator = AreaCalculator(args.pdf_path, args.scale, args.debug)
-    result = calculator.calculate_area()
+    if args.daemon:
+        return run_daemon(args.scale, args.debug, not args.no_cache)
+
+    if args.pdf_path is None:
+        parser.error('pdf_path is required unless --daemon is given')
+
+    if args.all_pages:
+        result = calculate_all_pages(args.pdf_path, args.scale, args.debug, not args.no_cache)
+    else:
+        calculator = AreaCalculator(args.pdf_path, args.scale, args.debug, hint=args.hint,
+                                    use_cache=not args.no_cache)
+        result = calculator.calculate_area()
 
     # Output as JSON for easy parsing by Node.js
-    print(json.dumps(result, indent=2))
+    sys.stdout.buffer.write(orjson.dumps(
+        result, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE))
 
     return 0 if result['success'] else 1
 
@@ -14,6 +14,7 @@ export interface PythonAreaResult {
     success: boolean;
     shape_type?: string;
     is_simple_rectangle?: boolean;
+    rotation_degrees?: number;
     sections?: Array<{
         name: string;
         width_m?: number;
@@ -0,0 +1,161 @@
+"""Tests for the page cache, hint validation, outline detection and shape decomposition in areaCalculator."""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'services'))
+
+from areaCalculator import AreaCalculator, cache_dir, decompose_rectilinear  # noqa: E402
+
+
+def make_mask(*rects, size=(120, 120)):
+    """Binary mask that is the union of (x, y, width, height) rectangles."""
+    mask = np.zeros(size, dtype=np.uint8)
+    for x, y, w, h in rects:
+        mask[y:y + h, x:x + w] = 1
+    return mask
+
+
+def classify(mask):
+    rects = decompose_rectilinear(mask, max(1, int(0.02 * mask.sum())), 8)
+    return rects, AreaCalculator._classify_sections(rects)
+
+
+class DecomposeRectilinearTest(unittest.TestCase):
+
+    def test_rectangle(self):
+        rects, shape = classify(make_mask((10, 20, 80, 40)))
+        self.assertEqual(rects, [(10, 20, 80, 40)])
+        self.assertEqual(shape, 'rectangle')
+
+    def test_l_shape(self):
+        mask = make_mask((10, 10, 30, 100), (40, 80, 60, 30))
+        rects, shape = classify(mask)
+        self.assertEqual(len(rects), 2)
+        self.assertEqual(sum(w * h for _, _, w, h in rects), mask.sum())
+        self.assertEqual(shape, 'L-shape')
+
+    def test_t_shape_with_wide_bar(self):
+        rects, shape = classify(make_mask((10, 10, 100, 40), (45, 50, 30, 60)))
+        self.assertEqual(len(rects), 2)
+        self.assertEqual(shape, 'T-shape')
+
+    def test_t_shape_with_long_stem(self):
+        # The stem is the largest rectangle; the bar splits into two lined-up wings
+        rects, shape = classify(make_mask((10, 10, 100, 20), (45, 10, 30, 105)))
+        self.assertEqual(len(rects), 3)
+        self.assertEqual(shape, 'T-shape')
+
+    def test_u_shape(self):
+        mask = make_mask((10, 80, 100, 30), (10, 10, 25, 70), (85, 10, 25, 70))
+        rects, shape = classify(mask)
+        self.assertEqual(len(rects), 3)
+        self.assertEqual(sum(w * h for _, _, w, h in rects), mask.sum())
+        self.assertEqual(shape, 'U-shape')
+
+    def test_plus_is_complex(self):
+        rects, shape = classify(make_mask((10, 45, 100, 30), (45, 10, 30, 100)))
+        self.assertEqual(len(rects), 3)
+        self.assertEqual(shape, 'complex')
+
+    def test_zig_zag_is_complex(self):
+        # Wings on opposite sides of the main section, at opposite ends
+        mask = make_mask((10, 10, 40, 30), (40, 10, 40, 100), (70, 80, 40, 30))
+        rects, shape = classify(mask)
+        self.assertEqual(len(rects), 3)
+        self.assertEqual(shape, 'complex')
+
+    def test_step_is_complex(self):
+        # A single wing overhanging one end of the main section
+        rects, shape = classify(make_mask((10, 10, 60, 40), (50, 50, 50, 30)))
+        self.assertEqual(len(rects), 2)
+        self.assertEqual(shape, 'complex')
+
+    def test_empty_mask(self):
+        rects = decompose_rectilinear(np.zeros((50, 50), dtype=np.uint8), 1, 8)
+        self.assertEqual(list(rects), [])
+
+
+class DetectBuildingOutlineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calc = AreaCalculator(os.devnull, use_cache=False)
+
+    def test_prefers_enclosed_area_over_extent(self):
+        # The diagonal line's bounding box is larger than the building's
+        img = np.full((1500, 2000), 255, dtype=np.uint8)
+        cv2.rectangle(img, (100, 100), (900, 600), 0, 3)
+        cv2.line(img, (1000, 1350), (1900, 700), 0, 3)
+        contour = self.calc.detect_building_outline(img)
+        self.assertIsNotNone(contour)
+        self.assertAlmostEqual(cv2.contourArea(contour), 800 * 500, delta=0.05 * 800 * 500)
+
+
+class ValidateRectangleHintTest(unittest.TestCase):
+
+    # A 500x400 px rectangle on a 1000x800 px page, and its box as page fractions
+    BBOX = [0.2, 0.1875, 0.7, 0.6875]
+
+    def setUp(self):
+        self.img = np.full((800, 1000), 255, dtype=np.uint8)
+        cv2.rectangle(self.img, (200, 150), (700, 550), 0, 3)
+
+    def validate(self, **hint):
+        hint = {'shape_type': 'rectangle', 'bbox_hint': self.BBOX, 'confidence': 0.9, **hint}
+        calc = AreaCalculator(os.devnull, use_cache=False, hint=hint)
+        return calc.validate_rectangle_hint(self.img)
+
+    def test_valid_hint(self):
+        contour = self.validate()
+        self.assertIsNotNone(contour)
+        self.assertEqual(cv2.boundingRect(contour), (198, 148, 505, 405))
+
+    def test_dimension_line_next_to_wall(self):
+        cv2.line(self.img, (200, 562), (700, 562), 0, 1)
+        cv2.line(self.img, (200, 556), (200, 568), 0, 1)
+        cv2.line(self.img, (700, 556), (700, 568), 0, 1)
+        self.assertIsNone(self.validate())
+
+    def test_malformed_hint(self):
+        self.assertIsNone(self.validate(bbox_hint=self.BBOX[:3]))
+        self.assertIsNone(self.validate(bbox_hint=['0.2', 0.1875, 0.7, 0.6875]))
+        self.assertIsNone(self.validate(confidence='high'))
+
+    def test_low_confidence(self):
+        self.assertIsNone(self.validate(confidence=0.5))
+
+    def test_non_finite_box(self):
+        self.assertIsNone(self.validate(bbox_hint=[float('nan')] * 4))
+        self.assertIsNone(self.validate(bbox_hint=[0.2, 0.1875, float('inf'), 0.6875]))
+
+
+class PageCacheTest(unittest.TestCase):
+
+    def test_cache_dir_ignores_empty_or_relative_xdg(self):
+        home = Path.home() / '.cache' / 'material-takeoff'
+        for xdg in ('', 'relative/cache'):
+            with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': xdg}):
+                self.assertEqual(cache_dir(), home)
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': '/var/cache'}):
+            self.assertEqual(cache_dir(), Path('/var/cache/material-takeoff'))
+
+    def test_prune_removes_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp)
+            for i, name in enumerate(('old', 'mid', 'new')):
+                path = directory / f'{name}.npz'
+                path.write_bytes(b'x' * 100)
+                os.utime(path, (1000 + i, 1000 + i))
+            AreaCalculator._prune_cache(directory, max_bytes=250)
+            self.assertEqual(sorted(p.stem for p in directory.iterdir()), ['mid', 'new'])
+
+
+if __name__ == '__main__':
+    unittest.main()